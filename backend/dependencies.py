@@ -4,7 +4,10 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from jose import jwt, JWTError
 from typing import List, Optional
 import os
+import asyncio
+import logging
 import bcrypt
+from cachetools import TTLCache
 from datetime import datetime, timezone, timedelta
 from pydantic import BaseModel, Field, ConfigDict
 import uuid
@@ -76,6 +79,14 @@ def create_jwt_token(user_id: str, email: str, role: str) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
+# Resolved users by id; the short TTL bounds staleness across workers, local mutations evict directly
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '5'))
+_user_cache = TTLCache(maxsize=10_000, ttl=USER_CACHE_TTL_SECONDS)
+
+def invalidate_user_cache(user_id: str):
+    """Drop a user from the auth cache after it is changed or deleted"""
+    _user_cache.pop(user_id, None)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
     """Get current authenticated user"""
     try:
@@ -88,14 +99,20 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
                 detail="Invalid token"
             )
         
-        user_doc = await db.users.find_one({"id": user_id}, {"_id": 0})
+        user = _user_cache.get(user_id)
+        if user is not None:
+            return user
+        
+        user_doc = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
         if not user_doc:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found"
             )
         
-        return User(**user_doc)
+        user = User.model_construct(**user_doc)
+        _user_cache[user_id] = user
+        return user
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -133,6 +150,64 @@ def require_super_admin(current_user: User = Depends(get_current_user)):
 
 # ==================== AUDIT LOGGING ====================
 
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', '500'))
+AUDIT_FLUSH_SECONDS = float(os.environ.get('AUDIT_FLUSH_SECONDS', '0.1'))
+AUDIT_QUEUE_MAXSIZE = int(os.environ.get('AUDIT_QUEUE_MAXSIZE', '10000'))
+
+# Set by start_audit_writer(); until then log_audit writes inline
+audit_queue: Optional[asyncio.Queue] = None
+_audit_writer_task: Optional[asyncio.Task] = None
+
+async def _write_audit_batch(docs: List[dict]):
+    try:
+        await db.audit_logs.insert_many(docs, ordered=False)
+    except Exception as e:
+        # Log but don't fail the main operation
+        logging.error(f"Failed to write {len(docs)} audit logs: {str(e)}")
+
+async def _audit_writer():
+    """Drain the audit queue, flushing every AUDIT_FLUSH_SECONDS or AUDIT_BATCH_SIZE events"""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await audit_queue.get()]
+        deadline = loop.time() + AUDIT_FLUSH_SECONDS
+        while len(batch) < AUDIT_BATCH_SIZE and batch[-1] is not None:
+            # Take whatever is already queued without paying for a wait_for per event
+            if not audit_queue.empty():
+                batch.append(audit_queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(audit_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        # None is the shutdown sentinel queued by stop_audit_writer()
+        stopping = batch[-1] is None
+        docs = [doc for doc in batch if doc is not None]
+        if docs:
+            await _write_audit_batch(docs)
+        if stopping:
+            return
+
+def start_audit_writer():
+    """Start the background audit writer (call from app startup)"""
+    global audit_queue, _audit_writer_task
+    audit_queue = asyncio.Queue(maxsize=AUDIT_QUEUE_MAXSIZE)
+    _audit_writer_task = asyncio.create_task(_audit_writer())
+
+async def stop_audit_writer():
+    """Flush queued audit logs and stop the writer (call from app shutdown)"""
+    global audit_queue, _audit_writer_task
+    if _audit_writer_task is None:
+        return
+    await audit_queue.put(None)
+    await _audit_writer_task
+    audit_queue = None
+    _audit_writer_task = None
+
 async def log_audit(actor_id: str, action: str, target_resource: str, changes: dict = None, metadata: dict = None):
     """Log audit trail for critical operations"""
     audit_log = AuditLog(
@@ -143,11 +218,15 @@ async def log_audit(actor_id: str, action: str, target_resource: str, changes: d
         metadata=metadata or {}
     )
     
+    if audit_queue is not None:
+        # Only blocks when the writer has fallen AUDIT_QUEUE_MAXSIZE events behind (backpressure)
+        await audit_queue.put(audit_log.model_dump())
+        return
+    
     try:
         await db.audit_logs.insert_one(audit_log.model_dump())
     except Exception as e:
         # Log but don't fail the main operation
-        import logging
         logging.error(f"Failed to write audit log: {str(e)}")
 
 # ==================== MULTI-TENANT SUPPORT ====================
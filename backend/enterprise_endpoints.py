@@ -1,5 +1,46 @@
 # ==================== MODULE 1: CONNECTIVITY - WEBHOOKS & API TRIGGERS ====================
 
+# Trigger configs keyed by hook id; updated on create/delete here, the TTL covers other workers
+_trigger_cache = TTLCache(maxsize=4096, ttl=60)
+_trigger_locks: Dict[str, asyncio.Lock] = {}
+
+def compile_payload_mapping(payload_mapping: Dict[str, str]):
+    """Split each source field into its key path once per trigger instead of per request"""
+    return tuple((field, tuple(field.split(".")), variable) for field, variable in payload_mapping.items())
+
+def extract_payload_variables(payload: Dict[str, Any], compiled_mapping) -> Dict[str, Any]:
+    """Map payload fields to workflow variables; dotted fields reach into nested objects"""
+    variables = {}
+    for field, path, variable in compiled_mapping:
+        if field in payload:
+            variables[variable] = payload[field]
+        elif len(path) > 1:
+            value = payload
+            for key in path:
+                if not isinstance(value, dict) or key not in value:
+                    break
+                value = value[key]
+            else:
+                variables[variable] = value
+    return variables
+
+async def get_webhook_trigger_cached(hook_id: str) -> Optional[Dict[str, Any]]:
+    """Look up an inbound trigger, letting only one request per cold hook hit Mongo"""
+    trigger = _trigger_cache.get(hook_id)
+    if trigger is not None:
+        return trigger
+    
+    lock = _trigger_locks.setdefault(hook_id, asyncio.Lock())
+    async with lock:
+        trigger = _trigger_cache.get(hook_id)
+        if trigger is None:
+            trigger = await db.webhook_triggers.find_one({"hook_url": f"/api/v1/webhooks/{hook_id}"}, {"_id": 0})
+            if trigger:
+                trigger["compiled_mapping"] = compile_payload_mapping(trigger.get("payload_mapping", {}))
+                _trigger_cache[hook_id] = trigger
+    _trigger_locks.pop(hook_id, None)
+    return trigger
+
 @api_router.post("/v1/webhooks", response_model=WebhookTrigger, status_code=201)
 async def create_webhook_trigger(
     trigger_data: WebhookTriggerCreate,
@@ -10,13 +51,18 @@ async def create_webhook_trigger(
     hook_id = str(uuid.uuid4())
     hook_url = f"/api/v1/webhooks/{hook_id}"
     
-    trigger = WebhookTrigger(
+    # trigger_data is already validated and the rest is server-generated, so skip re-validation
+    trigger = WebhookTrigger.model_construct(
         **trigger_data.model_dump(),
         hook_url=hook_url,
         organization_id=current_user.organization_id
     )
     
-    await db.webhook_triggers.insert_one(trigger.model_dump())
+    trigger_doc = trigger.model_dump()
+    await db.webhook_triggers.insert_one(trigger_doc)
+    trigger_doc.pop("_id", None)
+    trigger_doc["compiled_mapping"] = compile_payload_mapping(trigger_doc["payload_mapping"])
+    _trigger_cache[hook_id] = trigger_doc
     await log_audit(current_user.id, "WEBHOOK_TRIGGER_CREATE", f"webhook-{trigger.id}")
     
     return trigger
@@ -26,66 +72,87 @@ async def webhook_listener(hook_id: str, request: Request):
     """Inbound webhook listener - triggers workflow"""
     try:
         # Get webhook configuration
-        hook_config = await db.webhook_triggers.find_one({"hook_url": f"/api/v1/webhooks/{hook_id}"}, {"_id": 0})
+        hook_config = await get_webhook_trigger_cached(hook_id)
         if not hook_config or not hook_config.get("is_active"):
             raise HTTPException(status_code=404, detail="Webhook not found or inactive")
         
-        # Parse incoming payload
-        payload = await request.json()
-        
-        # Map payload to workflow variables
-        workflow_variables = {}
-        for payload_field, variable_name in hook_config.get("payload_mapping", {}).items():
-            if payload_field in payload:
-                workflow_variables[variable_name] = payload[payload_field]
+        now = datetime.now(timezone.utc).isoformat()
         
-        # Add webhook metadata
-        workflow_variables["webhook_payload"] = payload
-        workflow_variables["webhook_timestamp"] = datetime.now(timezone.utc).isoformat()
-        workflow_variables["webhook_source"] = hook_config["name"]
+        # Parse incoming payload
+        try:
+            payload = orjson.loads(await request.body())
+        except orjson.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Webhook body must be valid JSON")
         
-        # Create task and start workflow
-        task = Task(
-            title=f"Webhook Trigger: {hook_config['name']}",
-            description=f"Task created by webhook {hook_id}",
-            creator_id="system",
-            organization_id=hook_config.get("organization_id"),
-            workflow_id=hook_config["workflow_id"],
-            metadata={"webhook_id": hook_id, "payload": payload}
-        )
+        # Batch deliveries (a top-level JSON array) create one task per event
+        events = payload if isinstance(payload, list) else [payload]
+        tasks, task_variables = [], []
+        for event in events:
+            # Map payload to workflow variables
+            workflow_variables = extract_payload_variables(event, hook_config["compiled_mapping"]) if isinstance(event, dict) else {}
+            
+            # Add webhook metadata
+            workflow_variables["webhook_payload"] = event
+            workflow_variables["webhook_timestamp"] = now
+            workflow_variables["webhook_source"] = hook_config["name"]
+            
+            # Create task (all fields server-generated, so no validation pass)
+            tasks.append(Task.model_construct(
+                title=f"Webhook Trigger: {hook_config['name']}",
+                description=f"Task created by webhook {hook_id}",
+                creator_id="system",
+                organization_id=hook_config.get("organization_id"),
+                workflow_id=hook_config["workflow_id"],
+                metadata={"webhook_id": hook_id, "payload": event},
+                created_at=now,
+                updated_at=now
+            ))
+            task_variables.append(workflow_variables)
         
-        await db.tasks.insert_one(task.model_dump())
+        if len(tasks) == 1:
+            await db.tasks.insert_one(tasks[0].model_dump())
+        elif tasks:
+            await db.tasks.insert_many([task.model_dump() for task in tasks], ordered=False)
         
-        # Start workflow with webhook variables
-        workflow_state = await workflow_engine.start_workflow(
-            task.id, 
-            hook_config["workflow_id"], 
-            "system",
-            workflow_variables
-        )
+        # Start workflows with webhook variables
+        await asyncio.gather(*(
+            workflow_engine.start_workflow(task.id, hook_config["workflow_id"], "system", variables, now=now)
+            for task, variables in zip(tasks, task_variables)
+        ))
         
         # Update webhook stats
         await db.webhook_triggers.update_one(
             {"hook_url": f"/api/v1/webhooks/{hook_id}"},
             {
-                "$set": {"last_triggered": datetime.now(timezone.utc).isoformat()},
+                "$set": {"last_triggered": now},
                 "$inc": {"trigger_count": 1}
             }
         )
         
-        await log_audit("system", "WEBHOOK_TRIGGERED", f"task-{task.id}", {
-            "webhook_id": hook_id,
-            "workflow_id": hook_config["workflow_id"],
-            "payload_keys": list(payload.keys())
-        })
+        for task, event in zip(tasks, events):
+            await log_audit("system", "WEBHOOK_TRIGGERED", f"task-{task.id}", {
+                "webhook_id": hook_id,
+                "workflow_id": hook_config["workflow_id"],
+                "payload_keys": list(event.keys()) if isinstance(event, dict) else []
+            })
+        
+        if isinstance(payload, list):
+            return {
+                "success": True,
+                "task_ids": [task.id for task in tasks],
+                "workflow_started": bool(tasks),
+                "tasks_created": len(tasks)
+            }
         
         return {
             "success": True,
-            "task_id": task.id,
+            "task_id": tasks[0].id,
             "workflow_started": True,
-            "variables_mapped": len(workflow_variables)
+            "variables_mapped": len(task_variables[0])
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         await log_audit("system", "WEBHOOK_ERROR", f"webhook-{hook_id}", {"error": str(e)})
         raise HTTPException(status_code=500, detail=f"Webhook processing failed: {str(e)}")
@@ -100,9 +167,10 @@ async def list_webhook_triggers(current_user: User = Depends(require_admin)):
 @api_router.delete("/v1/webhooks/{hook_id}")
 async def delete_webhook_trigger(hook_id: str, current_user: User = Depends(require_admin)):
     """Delete webhook trigger"""
-    result = await db.webhook_triggers.delete_one({"id": hook_id})
-    if result.deleted_count == 0:
+    deleted = await db.webhook_triggers.find_one_and_delete({"id": hook_id}, projection={"_id": 0, "hook_url": 1})
+    if not deleted:
         raise HTTPException(status_code=404, detail="Webhook not found")
+    _trigger_cache.pop(deleted["hook_url"].rsplit("/", 1)[-1], None)
     
     await log_audit(current_user.id, "WEBHOOK_TRIGGER_DELETE", f"webhook-{hook_id}")
     return {"success": True}
@@ -121,12 +189,15 @@ async def update_node_retry_policy(
         {"id": workflow_id, "nodes.id": node_id},
         {"$set": {
             "nodes.$.retry_policy": retry_policy,
+            # Keep the stored graph lookup (see index_workflow_graph) in step with the node list
+            f"nodes_by_id.{node_id}.retry_policy": retry_policy,
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Workflow or node not found")
+    workflow_engine.invalidate_workflow(workflow_id)
     
     await log_audit(current_user.id, "NODE_RETRY_POLICY_UPDATE", f"workflow-{workflow_id}", {
         "node_id": node_id,
@@ -143,23 +214,19 @@ async def retry_failed_node(
     current_user: User = Depends(require_admin)
 ):
     """Manually retry a failed workflow node"""
-    task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
+    task = await db.tasks.find_one({"id": task_id}, {"_id": 0, "workflow_state.variables": 1})
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    workflow = await db.workflows.find_one({"id": workflow_id}, {"_id": 0})
+    workflow = await workflow_engine.get_workflow(workflow_id)
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
     # Find the node
-    node = None
-    for n in workflow.get("nodes", []):
-        if n["id"] == node_id:
-            node = WorkflowNode(**n)
-            break
-    
-    if not node:
+    node_doc = workflow["nodes_by_id"].get(node_id)
+    if not node_doc:
         raise HTTPException(status_code=404, detail="Node not found")
+    node = WorkflowNode(**node_doc)
     
     # Execute node with resilience
     try:
@@ -218,9 +285,25 @@ async def get_audit_logs(
         else:
             query["timestamp"] = {"$lte": end_date}
     
-    # Get logs
-    logs = await db.audit_logs.find(query, {"_id": 0}).sort("timestamp", -1).skip(offset).limit(limit).to_list(limit)
-    total = await db.audit_logs.count_documents(query)
+    if query:
+        # Get logs and total in one round-trip
+        pipeline = [
+            {"$match": query},
+            {"$sort": {"timestamp": -1}},
+            {"$facet": {
+                "logs": [{"$skip": offset}, {"$limit": limit}, {"$project": {"_id": 0}}],
+                "total": [{"$count": "n"}]
+            }}
+        ]
+        page = (await db.audit_logs.aggregate(pipeline).to_list(1))[0]
+        logs = page["logs"]
+        total = page["total"][0]["n"] if page["total"] else 0
+    else:
+        # Unfiltered: the total comes from collection metadata instead of counting every log
+        logs, total = await asyncio.gather(
+            db.audit_logs.find({}, {"_id": 0}).sort("timestamp", -1).skip(offset).limit(limit).to_list(limit),
+            db.audit_logs.estimated_document_count()
+        )
     
     return {
         "audit_logs": logs,
@@ -292,14 +375,12 @@ async def test_ai_worker_node(
     current_user: User = Depends(get_current_user)
 ):
     """Test AI worker node configuration"""
-    from jinja2 import Template
-    
     variables = context_variables or {}
     
     # Render prompts with variables
     try:
-        rendered_system = Template(system_prompt).render(**variables)
-        rendered_user = Template(user_prompt).render(**variables)
+        rendered_system = render_template(system_prompt, variables)
+        rendered_user = render_template(user_prompt, variables)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Template rendering failed: {str(e)}")
     
@@ -341,7 +422,7 @@ async def rewind_workflow(
 ):
     """Rewind workflow execution to a previous step"""
     # Verify task exists
-    task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
+    task = await db.tasks.find_one({"id": task_id}, {"_id": 0, "workflow_state": 1})
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
@@ -413,7 +494,7 @@ async def get_rewind_history(
     current_user: User = Depends(require_admin)
 ):
     """Get rewind history for a task"""
-    task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
+    task = await db.tasks.find_one({"id": task_id}, {"_id": 0, "workflow_state.rewind_history": 1})
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
@@ -430,7 +511,7 @@ async def get_rewind_history(
 @api_router.post("/auth/register", response_model=User, status_code=201)
 async def register(user_data: UserCreate, request: Request):
     # Check if user exists
-    existing = await db.users.find_one({"email": user_data.email})
+    existing = await db.users.find_one({"email": user_data.email}, {"_id": 1})
     if existing:
         raise HTTPException(status_code=409, detail="Email already registered")
     
@@ -443,26 +524,26 @@ async def register(user_data: UserCreate, request: Request):
     )
     
     user_doc = user.model_dump()
-    user_doc["password_hash"] = hash_password(user_data.password)
+    user_doc["password_hash"] = await asyncio.to_thread(hash_password, user_data.password)
     
     await db.users.insert_one(user_doc)
     
     # Log audit
     await log_audit(user.id, "USER_REGISTER", f"user-{user.id}", metadata={
-        "ip_address": getattr(request.state, "audit_info", {}).get("ip_address"),
-        "user_agent": getattr(request.state, "audit_info", {}).get("user_agent")
+        "ip_address": request.client.host if request.client else None,
+        "user_agent": request.headers.get("user-agent")
     })
     
     return user
 
 @api_router.post("/auth/login")
-async def login(credentials: UserLogin, request: Request):
+async def login(credentials: UserLogin, background_tasks: BackgroundTasks, request: Request):
     user_doc = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user_doc or not verify_password(credentials.password, user_doc.get("password_hash", "")):
+    if not user_doc or not await asyncio.to_thread(verify_password, credentials.password, user_doc.get("password_hash", "")):
         # Log failed attempt
         await log_audit("anonymous", "LOGIN_FAILED", f"email-{credentials.email}", metadata={
-            "ip_address": getattr(request.state, "audit_info", {}).get("ip_address"),
-            "user_agent": getattr(request.state, "audit_info", {}).get("user_agent")
+            "ip_address": request.client.host if request.client else None,
+            "user_agent": request.headers.get("user-agent")
         })
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
@@ -472,19 +553,20 @@ async def login(credentials: UserLogin, request: Request):
     
     token = create_jwt_token(user_doc["id"], user_doc["email"], user_doc["role"])
     
-    # Update last login
-    await db.users.update_one(
+    # Update last login once the response has gone out
+    background_tasks.add_task(
+        db.users.update_one,
         {"id": user_doc["id"]},
         {"$set": {"last_login": datetime.now(timezone.utc).isoformat()}}
     )
     
     # Log successful login
     await log_audit(user_doc["id"], "LOGIN_SUCCESS", f"user-{user_doc['id']}", metadata={
-        "ip_address": getattr(request.state, "audit_info", {}).get("ip_address"),
-        "user_agent": getattr(request.state, "audit_info", {}).get("user_agent")
+        "ip_address": request.client.host if request.client else None,
+        "user_agent": request.headers.get("user-agent")
     })
     
-    user = User(**user_doc)
+    user = User.model_construct(**user_doc)
     return {
         "access_token": token,
         "token_type": "bearer",
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 from datetime import datetime
+import asyncio
 import uuid
 from sqlalchemy import create_engine, text
 
@@ -103,16 +104,32 @@ async def sync_users(connection_id: str, current_user = Depends(require_admin)):
                 await db.db_connections.update_one({"id": connection_id}, {"$set": {"sync_status": "error"}})
                 return {"status": "error", "message": f"All sync attempts failed. Error: {str(e3)}"}
 
+    # Every synced user gets the same default password, so hash it once (off the event loop) per sync
+    default_password_hash = None
     try:
+        # One $in lookup for the whole source table instead of a find_one per row
+        emails = list({row[0] for row in result_rows})
+        existing_users = await db.users.find(
+            {"email": {"$in": emails}}, {"_id": 0, "email": 1, "user_group": 1}
+        ).to_list(None) if emails else []
+        existing_by_email = {u["email"]: u for u in existing_users}
+        
+        new_users = {}
+        group_changes = {}
         for row in result_rows:
             email = row[0]
             full_name = row[1]
             user_group = str(row[2]) if (len(row) > 2 and row[2]) else "General"
             
-            existing = await db.users.find_one({"email": email})
-            
-            if not existing:
-                new_user = {
+            if email in new_users:
+                # Repeated row for a user created earlier in this sync
+                if new_users[email]["user_group"] != user_group:
+                    new_users[email]["user_group"] = user_group
+                    updated_count += 1
+            elif email not in existing_by_email:
+                if default_password_hash is None:
+                    default_password_hash = await asyncio.to_thread(hash_password, "Katalusis2025!")
+                new_users[email] = {
                     "id": str(uuid.uuid4()),
                     "email": email,
                     "full_name": full_name,
@@ -122,20 +139,29 @@ async def sync_users(connection_id: str, current_user = Depends(require_admin)):
                     "is_active": True,
                     "created_at": datetime.now().isoformat(),
                     "source": "external_sync",
-                    "password_hash": hash_password("Katalusis2025!"),
+                    "password_hash": default_password_hash,
                     "must_change_password": True
                 }
-                await db.users.insert_one(new_user)
                 synced_count += 1
             else:
                 # ✅ SMART UPDATE: Only update if the group actually changed
-                current_group = existing.get("user_group")
+                current_group = group_changes.get(email, existing_by_email[email].get("user_group"))
                 if current_group != user_group:
-                    await db.users.update_one(
-                        {"email": email},
-                        {"$set": {"user_group": user_group}}
-                    )
+                    group_changes[email] = user_group
                     updated_count += 1
+        
+        if new_users:
+            await db.users.insert_many(list(new_users.values()), ordered=False)
+        
+        # One update per distinct target group rather than per user
+        emails_by_group = {}
+        for email, user_group in group_changes.items():
+            emails_by_group.setdefault(user_group, []).append(email)
+        for user_group, group_emails in emails_by_group.items():
+            await db.users.update_many(
+                {"email": {"$in": group_emails}},
+                {"$set": {"user_group": user_group}}
+            )
 
         await db.db_connections.update_one(
             {"id": connection_id},
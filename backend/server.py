@@ -1,18 +1,33 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Query, Request
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Query, Response, BackgroundTasks
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer
 from starlette.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field, EmailStr, ConfigDict
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, EmailStr, ConfigDict, ValidationError
+from typing import List, Optional, Dict, Any, Final
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
 import os
+import asyncio
 import logging
 import uuid
+import tempfile
+import hashlib
+import random
 import pandas as pd
-import io
+import httpx
+import orjson
+from functools import lru_cache
+from jinja2 import Environment, TemplateError
+from cachetools import TTLCache
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pandas' C engine is used instead
+    pa = None
 
 # ===========================================================
 # START: Local AI Placeholder
@@ -38,14 +53,22 @@ from dependencies import (
     User, AuditLog, Organization,
     get_current_user, require_role, require_admin, require_super_admin,
     get_current_organization, hash_password, verify_password, create_jwt_token,
-    log_audit, set_database
+    log_audit, set_database, start_audit_writer, stop_audit_writer, invalidate_user_cache
 )
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', '200')),
+    minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', '20')),
+    maxIdleTimeMS=int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '60000')),
+    waitQueueTimeoutMS=int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '2000')),
+    serverSelectionTimeoutMS=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '3000')),
+    compressors=os.environ.get('MONGO_COMPRESSORS', 'zstd,zlib'),
+)
 db = client[os.environ['DB_NAME']]
 set_database(db)
 
@@ -54,27 +77,12 @@ JWT_ALGORITHM = os.environ['JWT_ALGORITHM']
 JWT_EXPIRATION_HOURS = int(os.environ['JWT_EXPIRATION_HOURS'])
 EMERGENT_LLM_KEY = os.environ['EMERGENT_LLM_KEY']
 
-app = FastAPI(title="Katalusis Workflow OS Enterprise", version="2.0.0")
+app = FastAPI(title="Katalusis Workflow OS Enterprise", version="2.0.0", default_response_class=ORJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-class AuditMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if request.method == "GET" or "/health" in str(request.url):
-            return await call_next(request)
-        request.state.audit_info = {
-            "ip_address": request.client.host if request.client else None,
-            "user_agent": request.headers.get("user-agent"),
-            "method": request.method,
-            "path": str(request.url.path)
-        }
-        response = await call_next(request)
-        return response
-
-app.add_middleware(AuditMiddleware)
-
 # ==================== MODELS ====================
 
 class TenantOnboard(BaseModel):
@@ -255,38 +263,98 @@ class CommentCreate(BaseModel):
 
 # ==================== WORKFLOW ENGINE ====================
 
+# Node templates are re-rendered on every execution; compile each distinct source once
+JINJA_ENV = Environment(autoescape=False)
+
+@lru_cache(maxsize=2048)
+def compile_template(source: str):
+    return JINJA_ENV.from_string(source)
+
+def render_template(source: str, variables: Dict[str, Any]) -> str:
+    """Render a node template; plain strings (static headers etc.) skip Jinja entirely"""
+    if "{" not in source and "\r" not in source:
+        # Same output Jinja gives for text without tags: one trailing newline dropped
+        return source[:-1] if source.endswith("\n") else source
+    return compile_template(source).render(**variables)
+
+# Newest entries kept in workflow_state.step_history/completed_steps; the audit log holds the full trail
+STEP_HISTORY_LIMIT = 200
+
+def _append_expr(path: str, *items: Dict[str, Any], limit: Optional[int] = None) -> Dict[str, Any]:
+    """Pipeline-update expression appending literal items to the array at path, keeping the last `limit`"""
+    appended = {"$concatArrays": [{"$ifNull": [f"${path}", []]}, {"$literal": list(items)}]}
+    return {"$slice": [appended, -limit]} if limit else appended
+
+def index_workflow_graph(workflow: Dict[str, Any]) -> Dict[str, Any]:
+    """Store derived graph lookups on a workflow doc so the engine doesn't rescan nodes/edges per run"""
+    incoming_nodes = {edge["target"] for edge in workflow.get("edges", [])}
+    workflow["nodes_by_id"] = {n["id"]: n for n in workflow.get("nodes", [])}
+    edges_by_source: Dict[str, List[str]] = {}
+    for edge in workflow.get("edges", []):
+        edges_by_source.setdefault(edge["source"], []).append(edge["target"])
+    workflow["edges_by_source"] = edges_by_source
+    workflow["entry_node_id"] = next(
+        (n["id"] for n in workflow.get("nodes", []) if n["id"] not in incoming_nodes or n["type"] == "task"), None
+    )
+    return workflow
+
+# Responses for near-deterministic AI worker prompts, keyed on model + prompts + sampling settings
+AI_CACHE_MAX_TEMPERATURE = float(os.environ.get('AI_CACHE_MAX_TEMPERATURE', '0.1'))
+AI_RESPONSE_CACHE = TTLCache(maxsize=1024, ttl=int(os.environ.get('AI_CACHE_TTL_SECONDS', '3600')))
+
+class PermanentNodeError(Exception):
+    """Node failure that a retry can't fix, e.g. a 4xx from the webhook target"""
+
+# Bad node config/templates fail the same way on every attempt
+NON_RETRYABLE_ERRORS = (PermanentNodeError, ValidationError, TemplateError)
+
+# Shared outbound client so webhook actions reuse pooled keep-alive/HTTP2 connections (opened on startup)
+http_client: Optional[httpx.AsyncClient] = None
+
 class EnterpriseWorkflowEngine:
     def __init__(self, database):
         self.db = database
+        # Workflow definitions are read-mostly; treat cached docs as read-only
+        self._workflow_cache = TTLCache(maxsize=1024, ttl=60)
     
-    async def start_workflow(self, task_id: str, workflow_id: str, user_id: str, initial_variables: Dict[str, Any] = None):
-        workflow = await self.db.workflows.find_one({"id": workflow_id}, {"_id": 0})
+    async def get_workflow(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        workflow = self._workflow_cache.get(workflow_id)
+        if workflow is None:
+            # rules/global_schema are editor-only; the engine never reads them
+            workflow = await self.db.workflows.find_one({"id": workflow_id}, {"_id": 0, "rules": 0, "global_schema": 0})
+            if workflow:
+                # Workflows saved before the graph lookups were stored get them computed here
+                if "edges_by_source" not in workflow:
+                    index_workflow_graph(workflow)
+                self._workflow_cache[workflow_id] = workflow
+        return workflow
+    
+    def invalidate_workflow(self, workflow_id: str):
+        self._workflow_cache.pop(workflow_id, None)
+    
+    async def start_workflow(self, task_id: str, workflow_id: str, user_id: str, initial_variables: Dict[str, Any] = None, now: Optional[str] = None):
+        workflow = await self.get_workflow(workflow_id)
         if not workflow:
             raise HTTPException(status_code=404, detail="Workflow not found")
         
-        first_node = None
-        if workflow.get("nodes"):
-            edges = workflow.get("edges", [])
-            incoming_nodes = {edge["target"] for edge in edges}
-            for node in workflow["nodes"]:
-                if node["id"] not in incoming_nodes or node["type"] == "task":
-                    first_node = node
-                    break
+        first_node_id = workflow.get("entry_node_id")
+        first_node = workflow["nodes_by_id"].get(first_node_id)
         
         if not first_node:
             raise HTTPException(status_code=400, detail="Workflow has no starting node")
         
+        now = now or datetime.now(timezone.utc).isoformat()
         workflow_state = {
             "current_step": first_node["id"],
             "step_history": [{
                 "step_id": first_node["id"],
                 "step_name": first_node["label"],
                 "status": "started",
-                "started_at": datetime.now(timezone.utc).isoformat(),
+                "started_at": now,
                 "started_by": user_id
             }],
             "pending_approvals": [],
-            "started_at": datetime.now(timezone.utc).isoformat(),
+            "started_at": now,
             "completed_steps": [],
             "variables": {**workflow.get("variables", {}), **(initial_variables or {})}
         }
@@ -297,7 +365,7 @@ class EnterpriseWorkflowEngine:
                 "workflow_id": workflow_id,
                 "workflow_state": workflow_state,
                 "status": "in_progress",
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "updated_at": now
             }}
         )
         
@@ -313,11 +381,12 @@ class EnterpriseWorkflowEngine:
         while attempt <= max_attempts:
             try:
                 if node.type == "webhook_action":
-                    result = await self._execute_webhook_action(node, workflow_variables)
+                    execution = self._execute_webhook_action(node, workflow_variables)
                 elif node.type == "ai_worker":
-                    result = await self._execute_ai_worker(node, workflow_variables)
+                    execution = self._execute_ai_worker(node, workflow_variables)
                 else:
-                    result = await self._execute_standard_node(node, workflow_variables)
+                    execution = self._execute_standard_node(node, workflow_variables)
+                result = await asyncio.wait_for(execution, timeout=node.timeout_seconds)
                 
                 await log_audit(user_id, "NODE_EXECUTE_SUCCESS", f"task-{task_id}", {
                     "node_id": node.id,
@@ -327,14 +396,15 @@ class EnterpriseWorkflowEngine:
                 return result
                 
             except Exception as e:
-                error_msg = str(e)
+                error_msg = str(e) or type(e).__name__
                 await log_audit(user_id, "NODE_EXECUTE_ERROR", f"task-{task_id}", {
                     "node_id": node.id,
                     "attempt": attempt,
                     "error": error_msg
                 })
                 
-                if attempt >= max_attempts:
+                # Permanent failures skip the remaining backoff and route/suspend straight away
+                if attempt >= max_attempts or isinstance(e, NON_RETRYABLE_ERRORS):
                     if node.on_error_next_node:
                         await log_audit(user_id, "NODE_ERROR_ROUTE", f"task-{task_id}", {
                             "from_node": node.id,
@@ -349,230 +419,244 @@ class EnterpriseWorkflowEngine:
                         await log_audit(user_id, "WORKFLOW_SUSPENDED", f"task-{task_id}", {"reason": error_msg})
                         raise HTTPException(status_code=500, detail=f"Workflow suspended due to: {error_msg}")
                 
-                import asyncio
-                wait_time = delay_seconds * (2 ** (attempt - 1) if backoff else 1)
+                # Jitter spreads out retries from nodes that failed together against the same target
+                wait_time = delay_seconds * (2 ** (attempt - 1) if backoff else 1) * random.uniform(0.5, 1.5)
                 await asyncio.sleep(wait_time)
                 attempt += 1
     
     async def _execute_webhook_action(self, node: WorkflowNode, variables: Dict[str, Any]):
-        import httpx
-        from jinja2 import Template
         webhook_config = WebhookActionNode(**node.data)
-        template = Template(webhook_config.body_template)
-        body = template.render(**variables)
+        body = render_template(webhook_config.body_template, variables)
         headers = {}
         for key, value in webhook_config.headers.items():
-            headers[key] = Template(value).render(**variables)
+            headers[key] = render_template(value, variables)
         
-        async with httpx.AsyncClient() as client:
-            response = await client.request(
-                method=webhook_config.method,
-                url=webhook_config.url,
-                headers=headers,
-                content=body,
-                timeout=webhook_config.timeout_seconds,
-                follow_redirects=webhook_config.follow_redirects
-            )
-            if response.status_code >= 400:
-                raise HTTPException(status_code=response.status_code, detail=f"Webhook failed: {response.text}")
-            return {"success": True, "response_status": response.status_code, "response_body": response.text[:1000]}
+        response = await http_client.request(
+            method=webhook_config.method,
+            url=webhook_config.url,
+            headers=headers,
+            content=body,
+            timeout=webhook_config.timeout_seconds,
+            follow_redirects=webhook_config.follow_redirects
+        )
+        if response.status_code >= 400:
+            if response.status_code < 500 and response.status_code not in (408, 429):
+                raise PermanentNodeError(f"Webhook failed with {response.status_code}: {response.text}")
+            raise HTTPException(status_code=response.status_code, detail=f"Webhook failed: {response.text}")
+        return {"success": True, "response_status": response.status_code, "response_body": response.text[:1000]}
     
     async def _execute_ai_worker(self, node: WorkflowNode, variables: Dict[str, Any]):
-        from jinja2 import Template
         ai_config = AIWorkerNode(**node.data)
-        system_prompt = Template(ai_config.system_prompt).render(**variables)
-        user_prompt = Template(ai_config.user_prompt).render(**variables)
+        system_prompt = render_template(ai_config.system_prompt, variables)
+        user_prompt = render_template(ai_config.user_prompt, variables)
+        
+        cache_key = None
+        if ai_config.temperature < AI_CACHE_MAX_TEMPERATURE:
+            cache_key = hashlib.blake2b(
+                orjson.dumps([ai_config.model, system_prompt, user_prompt, ai_config.temperature, ai_config.max_tokens]),
+                digest_size=16
+            ).hexdigest()
+            cached = AI_RESPONSE_CACHE.get(cache_key)
+            if cached is not None:
+                return {"success": True, "variables_update": {ai_config.output_variable: cached}}
         
         chat = LlmChat(api_key=EMERGENT_LLM_KEY, session_id=f"ai-worker-{node.id}", system_message=system_prompt).with_model("openai", "gpt-4o")
         response = await chat.send_message(UserMessage(text=user_prompt))
+        if cache_key:
+            AI_RESPONSE_CACHE[cache_key] = response
         return {"success": True, "variables_update": {ai_config.output_variable: response}}
     
     async def _execute_standard_node(self, node: WorkflowNode, variables: Dict[str, Any]):
         return {"success": True}
 
     async def progress_workflow(self, task_id: str, user_id: str, comment: Optional[str] = None, data: Optional[Dict[str, Any]] = None):
-        task = await self.db.tasks.find_one({"id": task_id}, {"_id": 0})
+        completed, workflow_state = await self._advance_workflow(task_id, user_id, comment, data)
+        return {"status": "completed"} if completed else workflow_state
+    
+    async def _advance_workflow(self, task_id: str, user_id: str, comment: Optional[str] = None, data: Optional[Dict[str, Any]] = None, now: Optional[str] = None):
+        task = await self.db.tasks.find_one({"id": task_id}, {"_id": 0, "workflow_id": 1, "workflow_state.current_step": 1})
         if not task: raise HTTPException(status_code=404, detail="Task not found")
         
-        workflow_state = task.get("workflow_state")
-        if not workflow_state or not workflow_state.get("current_step"): raise HTTPException(status_code=400, detail="No active workflow")
+        current_step_id = (task.get("workflow_state") or {}).get("current_step")
+        if not current_step_id: raise HTTPException(status_code=400, detail="No active workflow")
         
-        current_step_id = workflow_state["current_step"]
-        workflow = await self.db.workflows.find_one({"id": task.get("workflow_id")}, {"_id": 0})
+        workflow = await self.get_workflow(task.get("workflow_id"))
         
-        current_node = next((n for n in workflow["nodes"] if n["id"] == current_step_id), None)
+        current_node = workflow["nodes_by_id"].get(current_step_id)
+        now = now or datetime.now(timezone.utc).isoformat()
         
-        workflow_state["completed_steps"].append({
-            "step_id": current_step_id,
-            "step_name": current_node["label"] if current_node else "Unknown",
-            "completed_at": datetime.now(timezone.utc).isoformat(),
-            "completed_by": user_id,
-            "comment": comment,
-            "data": data or {}
-        })
+        # Everything below is applied by one pipeline update, built up stage field by stage field
+        stage = {
+            "updated_at": now,
+            "workflow_state.completed_steps": _append_expr("workflow_state.completed_steps", {
+                "step_id": current_step_id,
+                "step_name": current_node["label"] if current_node else "Unknown",
+                "completed_at": now,
+                "completed_by": user_id,
+                "comment": comment,
+                "data": data or {}
+            }, limit=STEP_HISTORY_LIMIT)
+        }
 
         if data:
-            current_metadata = task.get("metadata", {})
-            updated_metadata = {**current_metadata, **data}
-            await self.db.tasks.update_one(
-                {"id": task_id},
-                {"$set": {"metadata": updated_metadata}}
-            )
+            stage["metadata"] = {"$mergeObjects": [{"$ifNull": ["$metadata", {}]}, {"$literal": data}]}
 
-        edges = workflow.get("edges", [])
-        next_step_id = None
-        for edge in edges:
-            if edge["source"] == current_step_id:
-                next_step_id = edge["target"]
-                break
+        next_step_id = workflow["edges_by_source"].get(current_step_id, [None])[0]
         
         if not next_step_id:
-            await self.db.tasks.update_one({"id": task_id}, {"$set": {
+            stage.update({
                 "status": "completed",
-                "completed_at": datetime.now(timezone.utc).isoformat(),
-                "workflow_state.current_step": None,
-                "workflow_state.completed_steps": workflow_state["completed_steps"]
-            }})
-            await log_audit(user_id, "WORKFLOW_COMPLETE", f"task-{task_id}", {})
-            return {"status": "completed"}
-        
-        next_node = next((n for n in workflow.get("nodes", []) if n["id"] == next_step_id), None)
-        
-        if next_node and next_node["type"] == "approval":
-            approval = {
-                "step_id": next_node["id"],
-                "step_name": next_node["label"],
-                "assigned_to": user_id,
-                "requested_at": datetime.now(timezone.utc).isoformat()
-            }
-            await self.db.tasks.update_one({"id": task_id}, {
-                "$set": {
-                    "workflow_state.current_step": next_step_id,
-                    "workflow_state.completed_steps": workflow_state["completed_steps"]
-                },
-                "$push": {
-                    "workflow_state.pending_approvals": approval,
-                    "workflow_state.step_history": {
-                        "step_id": next_step_id,
-                        "step_name": next_node["label"],
-                        "status": "pending_approval",
-                        "started_at": datetime.now(timezone.utc).isoformat()
-                    }
-                }
+                "completed_at": now,
+                "workflow_state.current_step": None
             })
         else:
-            await self.db.tasks.update_one({"id": task_id}, {
-                "$set": {
-                    "workflow_state.current_step": next_step_id,
-                    "workflow_state.completed_steps": workflow_state["completed_steps"]
-                },
-                "$push": {
-                    "workflow_state.step_history": {
-                        "step_id": next_step_id,
-                        "step_name": next_node["label"] if next_node else "Unknown",
-                        "status": "started",
-                        "started_at": datetime.now(timezone.utc).isoformat(),
-                        "started_by": user_id,
-                        "comment": comment
-                    }
+            next_node = workflow["nodes_by_id"].get(next_step_id)
+            stage["workflow_state.current_step"] = {"$literal": next_step_id}
+            
+            if next_node and next_node["type"] == "approval":
+                stage["workflow_state.pending_approvals"] = _append_expr("workflow_state.pending_approvals", {
+                    "step_id": next_node["id"],
+                    "step_name": next_node["label"],
+                    "assigned_to": user_id,
+                    "requested_at": now
+                })
+                history_entry = {
+                    "step_id": next_step_id,
+                    "step_name": next_node["label"],
+                    "status": "pending_approval",
+                    "started_at": now
                 }
-            })
+            else:
+                history_entry = {
+                    "step_id": next_step_id,
+                    "step_name": next_node["label"] if next_node else "Unknown",
+                    "status": "started",
+                    "started_at": now,
+                    "started_by": user_id,
+                    "comment": comment
+                }
+            stage["workflow_state.step_history"] = _append_expr("workflow_state.step_history", history_entry, limit=STEP_HISTORY_LIMIT)
+        
+        # Guarded on the step we read, so two concurrent progressions can't both apply
+        updated_task = await self.db.tasks.find_one_and_update(
+            {"id": task_id, "workflow_state.current_step": current_step_id},
+            [{"$set": stage}],
+            projection={"_id": 0, "workflow_state": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not updated_task: raise HTTPException(status_code=409, detail="Workflow step changed concurrently")
+        
+        if not next_step_id:
+            await log_audit(user_id, "WORKFLOW_COMPLETE", f"task-{task_id}", {})
+            return True, updated_task.get("workflow_state")
         
-        updated_task = await self.db.tasks.find_one({"id": task_id}, {"_id": 0})
         await log_audit(user_id, "WORKFLOW_PROGRESS", f"task-{task_id}", {"to_step": next_step_id})
-        return updated_task.get("workflow_state")
+        return False, updated_task.get("workflow_state")
     
     async def approve_step(self, task_id: str, step_id: str, user_id: str, action: str, comment: Optional[str] = None):
-        task = await self.db.tasks.find_one({"id": task_id}, {"_id": 0})
-        if not task: raise HTTPException(status_code=404, detail="Task not found")
-        
-        workflow_state = task.get("workflow_state")
-        pending_approvals = workflow_state.get("pending_approvals", [])
-        approval = next((a for a in pending_approvals if a["step_id"] == step_id and a["assigned_to"] == user_id), None)
+        is_mine = {"$and": [
+            {"$eq": ["$$this.step_id", {"$literal": step_id}]},
+            {"$eq": ["$$this.assigned_to", {"$literal": user_id}]}
+        ]}
+        approval = {"$first": {"$filter": {"input": "$workflow_state.pending_approvals", "cond": is_mine}}}
+        now = datetime.now(timezone.utc).isoformat()
         
-        if not approval: raise HTTPException(status_code=404, detail="Approval not found")
-        
-        await self.db.tasks.update_one({"id": task_id}, {
-            "$pull": {"workflow_state.pending_approvals": {"step_id": step_id}},
-            "$push": {
-                "workflow_state.step_history": {
-                    "step_id": step_id,
-                    "step_name": approval["step_name"],
-                    "status": action,
-                    "completed_at": datetime.now(timezone.utc).isoformat(),
-                    "completed_by": user_id,
-                    "comment": comment
-                }
-            }
-        })
+        # Resolve, pull and record the approval in one update; the filter enforces it exists
+        updated_task = await self.db.tasks.find_one_and_update(
+            {"id": task_id, "workflow_state.pending_approvals": {"$elemMatch": {"step_id": step_id, "assigned_to": user_id}}},
+            [{"$set": {
+                "workflow_state.pending_approvals": {"$filter": {
+                    "input": "$workflow_state.pending_approvals",
+                    "cond": {"$ne": ["$$this.step_id", {"$literal": step_id}]}
+                }},
+                "workflow_state.step_history": {"$slice": [{"$concatArrays": [
+                    {"$ifNull": ["$workflow_state.step_history", []]},
+                    [{
+                        "step_id": {"$literal": step_id},
+                        "step_name": {"$getField": {"field": "step_name", "input": approval}},
+                        "status": {"$literal": action},
+                        "completed_at": now,
+                        "completed_by": {"$literal": user_id},
+                        "comment": {"$literal": comment}
+                    }]
+                ]}, -STEP_HISTORY_LIMIT]}
+            }}],
+            projection={"_id": 0, "workflow_state": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not updated_task:
+            if not await self.db.tasks.find_one({"id": task_id}, {"_id": 1}):
+                raise HTTPException(status_code=404, detail="Task not found")
+            raise HTTPException(status_code=404, detail="Approval not found")
         
+        workflow_state = updated_task.get("workflow_state")
         if action == "approve":
-            await self.progress_workflow(task_id, user_id, f"Approved: {comment or ''}")
+            _, workflow_state = await self._advance_workflow(task_id, user_id, f"Approved: {comment or ''}", now=now)
         
-        updated_task = await self.db.tasks.find_one({"id": task_id}, {"_id": 0})
         await log_audit(user_id, "WORKFLOW_APPROVAL", f"task-{task_id}", {"action": action, "step_id": step_id})
-        return updated_task.get("workflow_state")
+        return workflow_state
     
     async def rewind_workflow(self, task_id: str, target_step_id: str, user_id: str, reason: str):
-        task = await self.db.tasks.find_one({"id": task_id}, {"_id": 0})
+        task = await self.db.tasks.find_one({"id": task_id}, {"_id": 0, "workflow_state.step_history": 1})
         if not task: raise HTTPException(status_code=404, detail="Task not found")
         
-        workflow_state = task.get("workflow_state")
-        step_history = workflow_state.get("step_history", [])
+        step_history = task.get("workflow_state", {}).get("step_history", [])
         target_step = next((s for s in step_history if s["step_id"] == target_step_id), None)
         
         if not target_step: raise HTTPException(status_code=404, detail="Target step not found in history")
         
-        await self.db.tasks.update_one({"id": task_id}, {
+        updated_task = await self.db.tasks.find_one_and_update({"id": task_id}, {
             "$set": {"workflow_state.current_step": target_step_id, "status": "in_progress"},
             "$push": {
                 "workflow_state.step_history": {
-                    "step_id": target_step_id,
-                    "step_name": target_step["step_name"],
-                    "status": "rewound",
-                    "rewound_at": datetime.now(timezone.utc).isoformat(),
-                    "rewound_by": user_id,
-                    "reason": reason
+                    "$each": [{
+                        "step_id": target_step_id,
+                        "step_name": target_step["step_name"],
+                        "status": "rewound",
+                        "rewound_at": datetime.now(timezone.utc).isoformat(),
+                        "rewound_by": user_id,
+                        "reason": reason
+                    }],
+                    "$slice": -STEP_HISTORY_LIMIT
                 }
             }
-        })
+        }, projection={"_id": 0, "workflow_state": 1}, return_document=ReturnDocument.AFTER)
         
         await log_audit(user_id, "WORKFLOW_REWIND", f"task-{task_id}", {"reason": reason})
-        updated_task = await self.db.tasks.find_one({"id": task_id}, {"_id": 0})
         return updated_task.get("workflow_state")
 
-workflow_engine = None
-if not workflow_engine:
-    workflow_engine = EnterpriseWorkflowEngine(db)
+workflow_engine: Final[EnterpriseWorkflowEngine] = EnterpriseWorkflowEngine(db)
 
 # ==================== AUTH ENDPOINTS ====================
 
 @api_router.post("/auth/register", response_model=User, status_code=201)
 async def register(user_data: UserCreate):
-    existing = await db.users.find_one({"email": user_data.email})
+    existing = await db.users.find_one({"email": user_data.email}, {"_id": 1})
     if existing: raise HTTPException(status_code=409, detail="Email already registered")
     
     user = User(email=user_data.email, full_name=user_data.full_name, role="user", organization_id=user_data.organization_id)
     user_doc = user.model_dump()
-    user_doc["password_hash"] = hash_password(user_data.password)
+    # bcrypt releases the GIL, so hashing on a worker thread keeps the event loop serving other requests
+    user_doc["password_hash"] = await asyncio.to_thread(hash_password, user_data.password)
     
     await db.users.insert_one(user_doc)
     await log_audit(user.id, "USER_REGISTER", f"user-{user.id}", {})
     return user
 
 @api_router.post("/auth/login")
-async def login(credentials: UserLogin):
+async def login(credentials: UserLogin, background_tasks: BackgroundTasks):
     user_doc = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user_doc or not verify_password(credentials.password, user_doc.get("password_hash", "")):
+    if not user_doc or not await asyncio.to_thread(verify_password, credentials.password, user_doc.get("password_hash", "")):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     if not user_doc.get("is_active", True):
         raise HTTPException(status_code=403, detail="Account is inactive")
     
     token = create_jwt_token(user_doc["id"], user_doc["email"], user_doc["role"])
-    await db.users.update_one({"id": user_doc["id"]}, {"$set": {"last_login": datetime.now(timezone.utc).isoformat()}})
+    # last_login is informational, so write it after the token has been sent
+    background_tasks.add_task(db.users.update_one, {"id": user_doc["id"]}, {"$set": {"last_login": datetime.now(timezone.utc).isoformat()}})
     
-    user = User(**user_doc)
+    user = User.model_construct(**user_doc)
     return {"access_token": token, "token_type": "bearer", "user": user}
 
 # ==================== PASSWORD MANAGEMENT ====================
@@ -581,10 +665,11 @@ class PasswordChange(BaseModel):
 
 @api_router.post("/auth/change-password")
 async def change_password(data: PasswordChange, current_user: User = Depends(get_current_user)):
-    new_hash = hash_password(data.new_password)
+    new_hash = await asyncio.to_thread(hash_password, data.new_password)
     await db.users.update_one({"id": current_user.id}, {
         "$set": {"password_hash": new_hash, "must_change_password": False, "updated_at": datetime.now(timezone.utc).isoformat()}
     })
+    invalidate_user_cache(current_user.id)
     return {"status": "success", "message": "Password updated successfully"}
 
 @api_router.get("/auth/me", response_model=User)
@@ -616,25 +701,42 @@ async def get_tasks(status: Optional[str] = None, priority: Optional[str] = None
             
         query["$or"] = or_conditions
     
-    total = await db.tasks.count_documents(query)
-    tasks = await db.tasks.find(query, {"_id": 0}).skip(offset).limit(limit).to_list(limit)
-    for task in tasks:
-        if task.get("assignee_id"):
-            assignee = await db.users.find_one({"id": task["assignee_id"]}, {"_id": 0, "id": 1, "full_name": 1})
-            task["assignee"] = assignee
-    return {"tasks": tasks, "total": total, "limit": limit, "offset": offset}
+    # Page, total and assignee join in one round-trip
+    pipeline = [
+        {"$match": query},
+        {"$sort": {"created_at": -1}},
+        {"$facet": {
+            "data": [
+                {"$skip": offset},
+                {"$limit": limit},
+                {"$project": {"_id": 0}},
+                {"$lookup": {
+                    "from": "users",
+                    "localField": "assignee_id",
+                    "foreignField": "id",
+                    "as": "assignee",
+                    "pipeline": [{"$project": {"_id": 0, "id": 1, "full_name": 1, "avatar_url": 1}}]
+                }},
+                {"$unwind": {"path": "$assignee", "preserveNullAndEmptyArrays": True}}
+            ],
+            "meta": [{"$count": "total"}]
+        }}
+    ]
+    page = (await db.tasks.aggregate(pipeline).to_list(1))[0]
+    tasks = page["data"]
+    total = page["meta"][0]["total"] if page["meta"] else 0
+    # Raw Mongo docs are already JSON-safe; skip jsonable_encoder's per-field walk
+    return ORJSONResponse({"tasks": tasks, "total": total, "limit": limit, "offset": offset})
 
 @api_router.post("/tasks", response_model=Task, status_code=201)
 async def create_task(task_data: TaskCreate, current_user: User = Depends(get_current_user)):
-    task = Task(**task_data.model_dump(), creator_id=current_user.id, organization_id=current_user.organization_id)
+    # dict(model) hands over the validated field values without an intermediate model_dump()
+    task = Task(**dict(task_data), creator_id=current_user.id, organization_id=current_user.organization_id)
     await db.tasks.insert_one(task.model_dump())
     await log_audit(current_user.id, "TASK_CREATE", f"task-{task.id}", {"title": task.title})
     
     # Auto-start workflow if assigned
     if task.workflow_id:
-        global workflow_engine
-        if not workflow_engine:
-            workflow_engine = EnterpriseWorkflowEngine(db)
         try:
             # ✅ FIX: Pass task.metadata as initial_variables so global fields are saved to the workflow context
             await workflow_engine.start_workflow(
@@ -650,34 +752,49 @@ async def create_task(task_data: TaskCreate, current_user: User = Depends(get_cu
 
 @api_router.get("/tasks/{task_id}", response_model=Task)
 async def get_task(task_id: str, current_user: User = Depends(get_current_user)):
-    task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
-    if not task: raise HTTPException(status_code=404, detail="Task not found")
-    
+    query = {"id": task_id}
     if current_user.role not in ["super_admin", "admin"]:
-        if task.get("assignee_id") != current_user.id and task.get("creator_id") != current_user.id:
-            # Allow if group matches
-            if task.get("assignee_group") != current_user.user_group:
-                raise HTTPException(status_code=403, detail="Access denied")
-    return Task(**task)
+        # Access check runs in the filter, so a denied task is never transferred
+        query["$or"] = [
+            {"assignee_id": current_user.id},
+            {"creator_id": current_user.id},
+            {"assignee_group": current_user.user_group}  # Allow if group matches
+        ]
+    
+    task = await db.tasks.find_one(query, {"_id": 0})
+    if not task:
+        if "$or" in query and await db.tasks.find_one({"id": task_id}, {"_id": 1}):
+            raise HTTPException(status_code=403, detail="Access denied")
+        raise HTTPException(status_code=404, detail="Task not found")
+    # Stored docs were validated on write; response serialization accepts the instance as-is
+    return Task.model_construct(**task)
 
 @api_router.put("/tasks/{task_id}", response_model=Task)
 async def update_task(task_id: str, task_update: TaskUpdate, current_user: User = Depends(get_current_user)):
-    task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
+    update_data = task_update.model_dump(exclude_none=True)
+    now = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = now
+    
+    # Pipeline update so completed_at is judged against the stored status in the same round-trip
+    set_stage = {k: {"$literal": v} for k, v in update_data.items()}
+    if update_data.get("status") == "completed":
+        set_stage["completed_at"] = {"$cond": [{"$ne": ["$status", "completed"]}, now, "$completed_at"]}
+    
+    task = await db.tasks.find_one_and_update(
+        {"id": task_id},
+        [{"$set": set_stage}],
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    update_data = {k: v for k, v in task_update.model_dump().items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
-    
     # Auto-set completed_at
     if update_data.get("status") == "completed" and task.get("status") != "completed":
-        update_data["completed_at"] = datetime.now(timezone.utc).isoformat()
+        update_data["completed_at"] = now
     
-    await db.tasks.update_one({"id": task_id}, {"$set": update_data})
     await log_audit(current_user.id, "TASK_UPDATE", f"task-{task_id}", update_data)
-    
-    updated_task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
-    return Task(**updated_task)
+    return Task.model_construct(**{**task, **update_data})
 
 @api_router.delete("/tasks/{task_id}", status_code=204)
 async def delete_task(task_id: str, current_user: User = Depends(require_role(["admin", "super_admin"]))):
@@ -685,43 +802,206 @@ async def delete_task(task_id: str, current_user: User = Depends(require_role(["
     await log_audit(current_user.id, "TASK_DELETE", f"task-{task_id}", {})
     return None
 
+IMPORT_BATCH_SIZE = 1000
+IMPORT_CHUNK_SIZE = 5000
+IMPORT_MAX_BYTES = 10 * 1024 * 1024
+IMPORT_SPOOL_BYTES = 2 * 1024 * 1024
+VALID_PRIORITIES = frozenset({'low', 'medium', 'high', 'critical'})
+VALID_STATUSES = frozenset({'new', 'in_progress', 'on_hold', 'completed'})
+
+# Defaults for every optional Task field, evaluated once; per-row fields are filled in by the importer
+IMPORT_TASK_DEFAULTS = {
+    name: field.get_default(call_default_factory=True)
+    for name, field in Task.model_fields.items() if not field.is_required()
+}
+
+def _import_column(df: pd.DataFrame, name: str, default: str = "") -> pd.Series:
+    """Return a stripped string column, or a column of defaults if it's missing"""
+    if name not in df.columns:
+        return pd.Series(default, index=df.index, dtype=object)
+    return df[name].fillna(default).astype(str).str.strip()
+
+def _validate_import_frame(df: pd.DataFrame, email_to_id: Dict[str, str], creator_id: str, organization_id: Optional[str]):
+    """Validate an import frame column-wise and build task docs for the valid rows"""
+    titles = _import_column(df, 'Title')
+    priorities = _import_column(df, 'Priority', 'medium').str.lower()
+    statuses = _import_column(df, 'Status', 'new').str.lower().str.replace(' ', '_')
+    emails = _import_column(df, 'AssigneeEmail')
+    assignee_ids = emails.str.lower().map(email_to_id)
+    due_raw = df['DueDate'] if 'DueDate' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    # format='mixed' parses each value on its own, so one file can mix ISO and US-style dates
+    due_dates = pd.to_datetime(due_raw, errors='coerce', format='mixed')
+
+    checks = [
+        ("Title", (titles == '') | (titles.str.len() > 150), titles, "Required and max 150 chars"),
+        ("Priority", ~priorities.isin(VALID_PRIORITIES), priorities, "Invalid priority value"),
+        ("Status", ~statuses.isin(VALID_STATUSES), statuses, "Invalid status value"),
+        ("DueDate", due_raw.notna() & due_dates.isna(), due_raw.astype(str), "Invalid date format"),
+        ("AssigneeEmail", (emails != '') & assignee_ids.isna(), emails, "User not found"),
+    ]
+
+    # Only the (usually small) set of failing cells is walked in Python
+    invalid = pd.Series(False, index=df.index)
+    errors = []
+    for field, mask, values, message in checks:
+        invalid |= mask
+        errors.extend(
+            {"row": int(idx) + 2, "field": field, "error": message, "value": values[idx]}
+            for idx in mask.index[mask]
+        )
+    errors.sort(key=lambda e: e["row"])
+
+    descriptions = _import_column(df, 'Description')
+    cleaned = pd.DataFrame({
+        "title": titles,
+        "description": descriptions.where(descriptions != ''),
+        "status": statuses,
+        "priority": priorities,
+        "assignee_id": assignee_ids,
+        "due_date": due_dates.map(lambda d: d.isoformat() if pd.notna(d) else None),
+        "tags": _import_column(df, 'Tags').str.split(',').map(lambda parts: [t.strip() for t in parts if t.strip()]),
+    }).astype(object)
+    cleaned = cleaned.where(cleaned.notna(), None)
+    # Rows are already validated, so build task docs directly instead of a Task per row
+    now = datetime.now(timezone.utc).isoformat()
+    docs = [
+        {
+            **IMPORT_TASK_DEFAULTS, **record,
+            "id": str(uuid.uuid4()), "creator_id": creator_id, "organization_id": organization_id,
+            "created_at": now, "updated_at": now
+        }
+        for record in cleaned.loc[~invalid].to_dict('records')
+    ]
+    return docs, errors, int(invalid.sum())
+
+def _iter_csv_frames(source):
+    """Yield an uploaded CSV as DataFrame chunks, parsed by pyarrow's multithreaded reader when installed"""
+    if pa is None:
+        yield from pd.read_csv(source, chunksize=IMPORT_CHUNK_SIZE)
+        return
+    # Read every column as text: validation is string-based, and per-block type inference could disagree
+    header = pd.read_csv(source, nrows=0).columns
+    source.seek(0)
+    reader = pa_csv.open_csv(
+        source,
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in header},
+            strings_can_be_null=True
+        )
+    )
+    for batch in reader:
+        yield batch.to_pandas()
+
+def _iter_excel_frames(source):
+    """Yield an uploaded XLSX as a single DataFrame (openpyxl has no chunked read)"""
+    yield pd.read_excel(source)
+
+async def _spool_upload(file: UploadFile):
+    """Copy an upload into a spooled temp file in 1 MB reads, rejecting it once it passes the size cap"""
+    upload = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES)
+    size = 0
+    while chunk := await file.read(1024 * 1024):
+        size += len(chunk)
+        if size > IMPORT_MAX_BYTES:
+            upload.close()
+            raise HTTPException(status_code=400, detail="File size exceeds 10MB limit")
+        upload.write(chunk)
+    upload.seek(0)
+    return upload
+
 @api_router.post("/tasks/import")
 async def import_tasks(file: UploadFile = File(...), dry_run: bool = Query(True), current_user: User = Depends(require_role(["admin", "super_admin"]))):
     if not file.filename.endswith(('.csv', '.xlsx')): raise HTTPException(status_code=400, detail="Only CSV/XLSX")
-    content = await file.read()
-    try:
-        df = pd.read_csv(io.BytesIO(content)) if file.filename.endswith('.csv') else pd.read_excel(io.BytesIO(content))
-    except Exception as e: raise HTTPException(status_code=400, detail=f"Parse error: {str(e)}")
-    
+    upload = await _spool_upload(file)
+    # CSV is read in chunks so peak memory tracks the chunk, not the file; XLSX can't stream
+    frames = _iter_csv_frames(upload) if file.filename.endswith('.csv') else _iter_excel_frames(upload)
+
+    total_rows = 0
     imported_count = 0
-    if not dry_run:
-        for _, row in df.iterrows():
-            task = Task(
-                title=str(row.get('Title')),
-                priority=str(row.get('Priority', 'medium')).lower(),
-                creator_id=current_user.id,
-                organization_id=current_user.organization_id
+    skipped_count = 0
+    errors = []
+    # Held until the whole file has parsed, so a bad chunk late in the file doesn't leave earlier ones inserted
+    import_docs = []
+    email_to_id = {}
+    looked_up_emails = set()
+    with upload:
+        while True:
+            # Parsing and validation are blocking pandas/pyarrow work, so keep them off the event loop
+            try:
+                df = await asyncio.to_thread(next, frames, None)
+            except Exception as e: raise HTTPException(status_code=400, detail=f"Parse error: {str(e)}")
+            if df is None: break
+            if 'Title' not in df.columns: raise HTTPException(status_code=400, detail="Missing required column: Title")
+            df.index = pd.RangeIndex(total_rows, total_rows + len(df))
+
+            # Resolve the chunk's new assignee emails in one query rather than one find_one per row
+            if 'AssigneeEmail' in df.columns:
+                emails = {str(e).strip().lower() for e in df['AssigneeEmail'].dropna().unique()} - looked_up_emails
+                if emails:
+                    # Stored emails keep their original case, so match case-insensitively (keys are lowercased)
+                    users = await db.users.find(
+                        {"email": {"$in": list(emails)}, "organization_id": current_user.organization_id},
+                        {"_id": 0, "id": 1, "email": 1},
+                        collation={"locale": "en", "strength": 2}
+                    ).to_list(None)
+                    email_to_id.update({u["email"].lower(): u["id"] for u in users})
+                    looked_up_emails |= emails
+
+            pending_docs, chunk_errors, chunk_skipped = await asyncio.to_thread(
+                _validate_import_frame, df, email_to_id, current_user.id, current_user.organization_id
             )
-            await db.tasks.insert_one(task.model_dump())
-            imported_count += 1
-            
-    return {"status": "completed", "imported_count": imported_count, "dry_run": dry_run}
+            total_rows += len(df)
+            imported_count += len(pending_docs)
+            skipped_count += chunk_skipped
+            errors.extend(chunk_errors)
+            if not dry_run:
+                import_docs.extend(pending_docs)
+
+    for i in range(0, len(import_docs), IMPORT_BATCH_SIZE):
+        await db.tasks.insert_many(import_docs[i:i + IMPORT_BATCH_SIZE], ordered=False)
+
+    return {
+        "status": "completed",
+        "total_rows": total_rows,
+        "imported_count": imported_count,
+        "skipped_count": skipped_count,
+        "errors": errors,
+        "dry_run": dry_run
+    }
+
+# The template never changes, so it is served as a prebuilt blob
+IMPORT_TEMPLATE_CSV = (
+    "Title,Description,AssigneeEmail,Priority,DueDate,Tags,Status\n"
+    "Sample Task 1,Description here,user@example.com,Medium,2025-12-31,\"tag1,tag2\",New\n"
+    "Sample Task 2,Another description,,High,2025-11-30,tag3,New\n"
+).encode()
+
+@api_router.get("/imports/template")
+async def download_template(current_user: User = Depends(get_current_user)):
+    return Response(
+        content=IMPORT_TEMPLATE_CSV,
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=task_import_template.csv"}
+    )
 
 @api_router.get("/workflows")
-async def get_workflows(current_user: User = Depends(get_current_user)):
+async def get_workflows(limit: int = Query(100, ge=1, le=200), offset: int = Query(0, ge=0), current_user: User = Depends(get_current_user)):
     query = {
         "$or": [
             {"organization_id": current_user.organization_id},
             {"is_template": True}
         ]
     }
-    workflows = await db.workflows.find(query, {"_id": 0}).to_list(100)
-    return {"workflows": workflows}
+    # nodes/edges stay: the list view renders counts and the canvas preview from them
+    projection = {"_id": 0, "rules": 0, "variables": 0, "global_schema": 0, "entry_node_id": 0, "nodes_by_id": 0, "edges_by_source": 0}
+    workflows = await db.workflows.find(query, projection).sort("updated_at", -1).skip(offset).limit(limit).to_list(limit)
+    return ORJSONResponse({"workflows": workflows, "limit": limit, "offset": offset})
 
 @api_router.post("/workflows", response_model=Workflow, status_code=201)
 async def create_workflow(workflow_data: WorkflowCreate, current_user: User = Depends(require_role(["admin", "super_admin"]))):
-    workflow = Workflow(**workflow_data.model_dump(), creator_id=current_user.id, organization_id=current_user.organization_id)
-    await db.workflows.insert_one(workflow.model_dump())
+    # Validated WorkflowNode instances pass straight through instead of being dumped and re-parsed
+    workflow = Workflow(**dict(workflow_data), creator_id=current_user.id, organization_id=current_user.organization_id)
+    await db.workflows.insert_one(index_workflow_graph(workflow.model_dump()))
     await log_audit(current_user.id, "WORKFLOW_CREATE", f"workflow-{workflow.id}", {})
     return workflow
 
@@ -734,17 +1014,23 @@ async def get_pending_approvals(current_user: User = Depends(get_current_user)):
         }
     }
     
-    tasks = await db.tasks.find(query, {"_id": 0}).to_list(100)
-    
-    pending_tasks = []
-    for task in tasks:
-        for approval in task["workflow_state"]["pending_approvals"]:
-            if approval["assigned_to"] == current_user.id:
-                pending_tasks.append({
-                    "task": task,
-                    "approval": approval,
-                    "workflow_step": approval["step_name"]
-                })
+    # Unwind and filter approvals server-side so only this user's rows (and a task summary) come back
+    pipeline = [
+        {"$match": query},
+        {"$limit": 100},
+        {"$project": {
+            "_id": 0,
+            "task": {
+                "id": "$id", "title": "$title", "status": "$status", "priority": "$priority",
+                "workflow_id": "$workflow_id", "due_date": "$due_date"
+            },
+            "approval": "$workflow_state.pending_approvals"
+        }},
+        {"$unwind": "$approval"},
+        {"$match": {"approval.assigned_to": current_user.id}},
+        {"$addFields": {"workflow_step": "$approval.step_name"}}
+    ]
+    pending_tasks = await db.tasks.aggregate(pipeline).to_list(None)
     
     return {"pending_approvals": pending_tasks}
 
@@ -761,11 +1047,11 @@ async def delete_workflow(
     current_user: User = Depends(require_role(["admin", "super_admin"]))
 ):
     """Delete a workflow (Admin only)"""
-    workflow = await db.workflows.find_one({"id": workflow_id})
+    workflow = await db.workflows.find_one_and_delete({"id": workflow_id}, projection={"_id": 0, "name": 1})
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
-    await db.workflows.delete_one({"id": workflow_id})
+    workflow_engine.invalidate_workflow(workflow_id)
     await log_audit(current_user.id, "WORKFLOW_DELETE", f"workflow-{workflow_id}", {"name": workflow.get("name")})
     return None
 
@@ -821,9 +1107,18 @@ async def get_task_workflow_status(
     current_user: User = Depends(get_current_user)
 ):
     """Get workflow status for a task"""
-    task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
-    if not task:
+    # The workflow id lives on the task, so join it server-side instead of a second round-trip
+    pipeline = [
+        {"$match": {"id": task_id}},
+        {"$limit": 1},
+        {"$project": {"_id": 0, "workflow_id": 1, "workflow_state": 1}},
+        {"$lookup": {"from": "workflows", "localField": "workflow_id", "foreignField": "id", "as": "workflow"}},
+        {"$project": {"workflow._id": 0}}
+    ]
+    tasks = await db.tasks.aggregate(pipeline).to_list(1)
+    if not tasks:
         raise HTTPException(status_code=404, detail="Task not found")
+    task = tasks[0]
     
     workflow_state = task.get("workflow_state")
     workflow_id = task.get("workflow_id")
@@ -836,8 +1131,7 @@ async def get_task_workflow_status(
     }
     
     if workflow_id:
-        workflow = await db.workflows.find_one({"id": workflow_id}, {"_id": 0})
-        result["workflow"] = workflow
+        result["workflow"] = task["workflow"][0] if task["workflow"] else None
     
     return result
 
@@ -940,19 +1234,20 @@ async def ai_chat(request: AIChatMessage, current_user: User = Depends(get_curre
         response = await chat.send_message(message)
         
         # Save conversation
+        now = datetime.now(timezone.utc).isoformat()
         await db.ai_sessions.update_one(
             {"session_id": session_id},
             {
-                "$set": {"user_id": current_user.id, "updated_at": datetime.now(timezone.utc).isoformat()},
+                "$set": {"user_id": current_user.id, "updated_at": now},
                 "$push": {
                     "messages": {
                         "$each": [
-                            {"role": "user", "content": request.message, "timestamp": datetime.now(timezone.utc).isoformat()},
-                            {"role": "assistant", "content": response, "timestamp": datetime.now(timezone.utc).isoformat()}
+                            {"role": "user", "content": request.message, "timestamp": now},
+                            {"role": "assistant", "content": response, "timestamp": now}
                         ]
                     }
                 },
-                "$setOnInsert": {"id": str(uuid.uuid4()), "created_at": datetime.now(timezone.utc).isoformat()}
+                "$setOnInsert": {"id": str(uuid.uuid4()), "created_at": now}
             },
             upsert=True
         )
@@ -964,7 +1259,7 @@ async def ai_chat(request: AIChatMessage, current_user: User = Depends(get_curre
 
 @api_router.post("/ai/suggest-rules")
 async def suggest_rules(workflow_id: str, current_user: User = Depends(get_current_user)):
-    workflow = await db.workflows.find_one({"id": workflow_id}, {"_id": 0})
+    workflow = await workflow_engine.get_workflow(workflow_id)
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
@@ -1019,21 +1314,25 @@ async def get_dashboard_analytics(
     if current_user.role not in ["super_admin", "admin"]:
         query["$or"] = [{"assignee_id": current_user.id}, {"creator_id": current_user.id}]
     
-    # 3. Calculate Basic Counts
-    total_tasks = await db.tasks.count_documents(query)
-    
-    completed_query = {**query, "status": "completed"}
-    completed_tasks = await db.tasks.count_documents(completed_query)
-    
-    pending_query = {**query, "status": {"$in": ["new", "in_progress"]}}
-    pending_tasks = await db.tasks.count_documents(pending_query)
-    
-    # 4. Calculate Overdue (Missing in your current code)
+    # 3. Basic + Overdue Counts in one scope scan
     now = datetime.now(timezone.utc).isoformat()
-    overdue_query = {**query, "status": {"$ne": "completed"}, "due_date": {"$lt": now}}
-    overdue_tasks = await db.tasks.count_documents(overdue_query)
+    pipeline = [
+        {"$match": query},
+        {"$facet": {
+            "total": [{"$count": "n"}],
+            "completed": [{"$match": {"status": "completed"}}, {"$count": "n"}],
+            "pending": [{"$match": {"status": {"$in": ["new", "in_progress"]}}}, {"$count": "n"}],
+            "overdue": [{"$match": {"status": {"$ne": "completed"}, "due_date": {"$lt": now}}}, {"$count": "n"}]
+        }}
+    ]
+    facets = (await db.tasks.aggregate(pipeline).to_list(1))[0]
+    counts = {name: (facets[name][0]["n"] if facets[name] else 0) for name in facets}
+    total_tasks = counts["total"]
+    completed_tasks = counts["completed"]
+    pending_tasks = counts["pending"]
+    overdue_tasks = counts["overdue"]
     
-    # 5. Calculate Rates (Missing in your current code)
+    # 4. Calculate Rates (Missing in your current code)
     completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
     
     return {
@@ -1052,10 +1351,11 @@ async def get_dashboard_analytics(
 # ==================== USER & ROLE MANAGEMENT ====================
 
 @api_router.get("/users")
-async def get_users(current_user: User = Depends(require_role(["admin", "super_admin"]))):
+async def get_users(limit: int = Query(100, ge=1, le=200), offset: int = Query(0, ge=0), current_user: User = Depends(require_role(["admin", "super_admin"]))):
     query = {"organization_id": current_user.organization_id}
-    users = await db.users.find(query, {"_id": 0, "password_hash": 0}).to_list(100)
-    return {"users": users}
+    projection = {"_id": 0, "password_hash": 0, "preferences": 0}
+    users = await db.users.find(query, projection).sort("full_name", 1).skip(offset).limit(limit).to_list(limit)
+    return ORJSONResponse({"users": users, "limit": limit, "offset": offset})
 
 @api_router.patch("/users/{user_id}/role")
 async def update_user_role(
@@ -1066,17 +1366,19 @@ async def update_user_role(
     if role not in ["super_admin", "admin", "user", "guest"]:
         raise HTTPException(status_code=400, detail="Invalid role")
     
+    now = datetime.now(timezone.utc).isoformat()
     result = await db.users.update_one(
         {"id": user_id},
-        {"$set": {"role": role, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"role": role, "updated_at": now}}
     )
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user_cache(user_id)
     
     await log_audit(current_user.id, "USER_ROLE_UPDATE", f"user-{user_id}", {"role": role})
     
-    return {"id": user_id, "role": role, "updated_at": datetime.now(timezone.utc).isoformat()}
+    return {"id": user_id, "role": role, "updated_at": now}
 
 @api_router.delete("/users/{user_id}", status_code=204)
 async def delete_user(user_id: str, current_user: User = Depends(require_super_admin)):
@@ -1085,6 +1387,7 @@ async def delete_user(user_id: str, current_user: User = Depends(require_super_a
     result = await db.users.delete_one({"id": user_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user_cache(user_id)
     await log_audit(current_user.id, "USER_DELETE", f"user-{user_id}", {})
     return None
 
@@ -1117,8 +1420,18 @@ async def get_audit_logs(
     if actor_id: query["actor_id"] = actor_id
     if action: query["action"] = action
     
-    logs = await db.audit_logs.find(query, {"_id": 0}).sort("timestamp", -1).limit(limit).to_list(limit)
-    total = await db.audit_logs.count_documents(query)
+    pipeline = [
+        {"$match": query},
+        # Sorted before the $facet: sub-pipelines can't use indexes, so the sort would otherwise run in memory
+        {"$sort": {"timestamp": -1}},
+        {"$facet": {
+            "logs": [{"$limit": limit}, {"$project": {"_id": 0}}],
+            "total": [{"$count": "n"}]
+        }}
+    ]
+    page = (await db.audit_logs.aggregate(pipeline).to_list(1))[0]
+    logs = page["logs"]
+    total = page["total"][0]["n"] if page["total"] else 0
     
     return {"logs": logs, "total": total}
 
@@ -1127,7 +1440,7 @@ async def onboard_tenant(
     data: TenantOnboard, 
     current_user: User = Depends(require_role(["super_admin"]))
 ):
-    if await db.users.find_one({"email": data.admin_email}):
+    if await db.users.find_one({"email": data.admin_email}, {"_id": 1}):
         raise HTTPException(status_code=400, detail="Email exists")
     
     new_org = Organization(name=data.company_name)
@@ -1139,7 +1452,7 @@ async def onboard_tenant(
         organization_id=new_org.id, is_active=True, must_change_password=True
     )
     user_doc = new_user.model_dump()
-    user_doc["password_hash"] = hash_password(temp_password)
+    user_doc["password_hash"] = await asyncio.to_thread(hash_password, temp_password)
     await db.users.insert_one(user_doc)
     
     return {"status": "success", "admin_user": {"email": data.admin_email, "temp_password": temp_password}}
@@ -1175,13 +1488,13 @@ async def reset_user_password(
     current_user: User = Depends(require_role(["super_admin"]))
 ):
     """Reset a user's password to a temp one and force change"""
-    user = await db.users.find_one({"id": user_id})
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "email": 1})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Generate secure temp password
     temp_password = f"Reset{uuid.uuid4().hex[:6].upper()}!"
-    new_hash = hash_password(temp_password)
+    new_hash = await asyncio.to_thread(hash_password, temp_password)
     
     await db.users.update_one(
         {"id": user_id},
@@ -1191,6 +1504,7 @@ async def reset_user_password(
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    invalidate_user_cache(user_id)
     
     await log_audit(current_user.id, "PASSWORD_RESET", f"user-{user_id}", {"target_email": user["email"]})
     
@@ -1218,8 +1532,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_background_writers():
+    start_audit_writer()
+
+@app.on_event("startup")
+async def open_http_client():
+    global http_client
+    http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=100)
+    )
+
+@app.on_event("startup")
+async def warmup_database():
+    """Open pooled connections up front so the first request doesn't pay the handshake"""
+    try:
+        await db.command("ping")
+    except Exception as e:
+        logger.error(f"Database warmup error: {str(e)}")
+
+@app.on_event("startup")
+async def ensure_indexes():
+    """Create the indexes behind the hot list/filter queries (no-op if they already exist)"""
+    results = await asyncio.gather(
+        db.tasks.create_index("id", unique=True),
+        db.tasks.create_index([("organization_id", 1), ("assignee_id", 1), ("status", 1), ("priority", 1)]),
+        db.tasks.create_index([("organization_id", 1), ("creator_id", 1), ("status", 1)]),
+        db.tasks.create_index([("organization_id", 1), ("status", 1), ("due_date", 1)]),
+        db.tasks.create_index("workflow_state.pending_approvals.assigned_to"),
+        db.tasks.create_index([("organization_id", 1), ("workflow_id", 1)]),
+        db.tasks.create_index([("organization_id", 1), ("created_at", -1)]),
+        db.tasks.create_index([("organization_id", 1), ("assignee_group", 1), ("assignee_id", 1)]),
+        db.users.create_index("id", unique=True),
+        db.users.create_index("email", unique=True),
+        db.users.create_index([("organization_id", 1), ("full_name", 1)]),
+        db.workflows.create_index("id", unique=True),
+        db.workflows.create_index([("organization_id", 1), ("updated_at", -1)]),
+        db.workflows.create_index([("is_template", 1), ("updated_at", -1)]),
+        db.webhook_triggers.create_index("id", unique=True),
+        db.webhook_triggers.create_index("hook_url", unique=True),
+        db.audit_logs.create_index([("timestamp", -1), ("actor_id", 1), ("action", 1)]),
+        db.audit_logs.create_index([("actor_id", 1), ("timestamp", -1)]),
+        db.audit_logs.create_index([("action", 1), ("timestamp", -1)]),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Index creation error: {str(result)}")
+
 @app.on_event("shutdown")
 async def shutdown_event():
+    await stop_audit_writer()
+    if http_client: await http_client.aclose()
     if client: client.close()
 
 # ==================== DATABASE SEEDING ====================
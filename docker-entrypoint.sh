@@ -19,4 +19,4 @@ echo "Port: ${PORT:-8000}"
 
 # Start the FastAPI application
 echo "Starting Katalusis Workflow OS..."
-exec uvicorn server:app --host 0.0.0.0 --port ${PORT:-8000} --workers ${WORKERS:-4}
+exec uvicorn server:app --host 0.0.0.0 --port ${PORT:-8000} --workers ${WORKERS:-4} --loop uvloop --http httptools
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Unified Testing Entrypoint
+Runs the backend API suite and then the enterprise features suite in one
+process, sharing the pooled client and the login from the backend suite.
+"""
+
+import asyncio
+
+from backend_test import BackendTester, SHARED_CLIENT, save_results
+from enterprise_test import EnterpriseTester
+
+async def main():
+    try:
+        async with BackendTester() as backend_tester:
+            results = await backend_tester.run_all_tests()
+            save_results(results)
+        
+        print()
+        # Both suites use the same test account, so the backend login is handed over as-is
+        async with EnterpriseTester(
+            access_token=backend_tester.access_token,
+            user_id=backend_tester.test_user_id
+        ) as enterprise_tester:
+            await enterprise_tester.run_enterprise_tests()
+        
+        return results
+    finally:
+        await SHARED_CLIENT.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+"""
+Task import tests against a real MongoDB (see test_workflow_engine for setup).
+"""
+
+import io
+
+from tests.test_workflow_engine import run_with_db
+
+from fastapi import UploadFile
+
+import server
+from dependencies import User
+
+ORG_ID = "org-1"
+
+
+def make_upload(csv_text: str) -> UploadFile:
+    return UploadFile(file=io.BytesIO(csv_text.encode()), filename="tasks.csv")
+
+
+def test_import_matches_mixed_case_stored_email(monkeypatch):
+    async def body(db):
+        # import_tasks reads the module-level handle
+        monkeypatch.setattr(server, "db", db)
+        await db.users.insert_one({
+            "id": "user-mixed", "email": "John.Doe@acme.com", "full_name": "John Doe", "organization_id": ORG_ID
+        })
+        admin = User(email="admin@acme.com", full_name="Admin", role="admin", organization_id=ORG_ID)
+
+        csv_text = (
+            "Title,AssigneeEmail\n"
+            "Exact case,John.Doe@acme.com\n"
+            "Lower case,john.doe@acme.com\n"
+            "Unknown,nobody@acme.com\n"
+        )
+        result = await server.import_tasks(file=make_upload(csv_text), dry_run=False, current_user=admin)
+
+        assert result["total_rows"] == 3
+        assert result["imported_count"] == 2
+        assert [(e["row"], e["field"], e["error"]) for e in result["errors"]] == [(4, "AssigneeEmail", "User not found")]
+
+        tasks = await db.tasks.find({}, {"_id": 0, "title": 1, "assignee_id": 1}).to_list(None)
+        assert sorted((t["title"], t["assignee_id"]) for t in tasks) == [
+            ("Exact case", "user-mixed"),
+            ("Lower case", "user-mixed"),
+        ]
+
+    run_with_db(body)
@@ -0,0 +1,189 @@
+"""
+Workflow engine progression tests against a real MongoDB.
+
+The progression and approval updates run as aggregation-pipeline updates on the
+server, so they are exercised end to end rather than mocked. Set MONGO_URL to a
+MongoDB 5.0+ instance (default mongodb://localhost:27017); each test uses its own
+throwaway database and is skipped when MongoDB or the backend dependencies are
+unavailable.
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("motor")
+pytest.importorskip("fastapi")
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# server.py reads these at import time; the tests never touch its own client
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "katalusis_test")
+os.environ.setdefault("JWT_SECRET", "test_secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_EXPIRATION_HOURS", "1")
+os.environ.setdefault("EMERGENT_LLM_KEY", "test")
+
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import server
+from dependencies import set_database
+
+USER_ID = "user-1"
+
+
+def run_with_db(test_body):
+    """Run test_body(db) on a fresh database, dropped afterwards"""
+    async def main():
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"], serverSelectionTimeoutMS=2000)
+        try:
+            await client.admin.command("ping")
+        except Exception as e:
+            client.close()
+            pytest.skip(f"MongoDB not reachable: {str(e)}")
+
+        db_name = f"katalusis_test_{uuid.uuid4().hex[:12]}"
+        db = client[db_name]
+        # log_audit writes through the dependencies module's handle
+        set_database(db)
+        try:
+            await test_body(db)
+        finally:
+            await client.drop_database(db_name)
+            client.close()
+
+    asyncio.run(main())
+
+
+async def create_approval_workflow(db):
+    """start (task) -> review (approval) -> done (task)"""
+    workflow = server.Workflow(
+        name="Approval Flow",
+        creator_id=USER_ID,
+        nodes=[
+            server.WorkflowNode(id="start", type="task", label="Start", position={"x": 0, "y": 0}),
+            server.WorkflowNode(id="review", type="approval", label="Review", position={"x": 100, "y": 0}),
+            server.WorkflowNode(id="done", type="task", label="Done", position={"x": 200, "y": 0}),
+        ],
+        edges=[
+            {"id": "e1", "source": "start", "target": "review"},
+            {"id": "e2", "source": "review", "target": "done"},
+        ],
+    )
+    await db.workflows.insert_one(server.index_workflow_graph(workflow.model_dump()))
+    return workflow
+
+
+async def create_started_task(db, engine, workflow):
+    task = server.Task(title="Approval test", creator_id=USER_ID)
+    await db.tasks.insert_one(task.model_dump())
+    await engine.start_workflow(task.id, workflow.id, USER_ID)
+    return task
+
+
+def test_progress_to_approval_node():
+    async def body(db):
+        engine = server.EnterpriseWorkflowEngine(db)
+        workflow = await create_approval_workflow(db)
+        task = await create_started_task(db, engine, workflow)
+
+        state = await engine.progress_workflow(task.id, USER_ID, comment="first", data={"amount": 5})
+
+        assert state["current_step"] == "review"
+        assert state["pending_approvals"] == [{
+            "step_id": "review",
+            "step_name": "Review",
+            "assigned_to": USER_ID,
+            "requested_at": state["pending_approvals"][0]["requested_at"],
+        }]
+        assert [s["step_id"] for s in state["completed_steps"]] == ["start"]
+        assert state["completed_steps"][0]["comment"] == "first"
+        assert state["step_history"][-1]["step_id"] == "review"
+        assert state["step_history"][-1]["status"] == "pending_approval"
+
+        stored = await db.tasks.find_one({"id": task.id}, {"_id": 0})
+        assert stored["metadata"] == {"amount": 5}
+        assert stored["status"] == "in_progress"
+
+    run_with_db(body)
+
+
+def test_approve_then_complete():
+    async def body(db):
+        engine = server.EnterpriseWorkflowEngine(db)
+        workflow = await create_approval_workflow(db)
+        task = await create_started_task(db, engine, workflow)
+        await engine.progress_workflow(task.id, USER_ID)
+
+        state = await engine.approve_step(task.id, "review", USER_ID, "approve", "looks good")
+
+        assert state["current_step"] == "done"
+        assert state["pending_approvals"] == []
+        approval_entry = next(s for s in state["step_history"] if s["status"] == "approve")
+        assert approval_entry["step_id"] == "review"
+        assert approval_entry["step_name"] == "Review"
+        assert approval_entry["completed_by"] == USER_ID
+        assert approval_entry["comment"] == "looks good"
+        assert [s["step_id"] for s in state["completed_steps"]] == ["start", "review"]
+        assert state["completed_steps"][-1]["comment"] == "Approved: looks good"
+
+        # The approval is consumed, so approving again finds nothing
+        with pytest.raises(HTTPException) as exc_info:
+            await engine.approve_step(task.id, "review", USER_ID, "approve")
+        assert exc_info.value.status_code == 404
+
+        result = await engine.progress_workflow(task.id, USER_ID)
+        assert result == {"status": "completed"}
+
+        stored = await db.tasks.find_one({"id": task.id}, {"_id": 0})
+        assert stored["status"] == "completed"
+        assert stored["completed_at"]
+        assert stored["workflow_state"]["current_step"] is None
+        assert [s["step_id"] for s in stored["workflow_state"]["completed_steps"]] == ["start", "review", "done"]
+
+    run_with_db(body)
+
+
+def test_concurrent_progress_conflicts():
+    class LockstepEngine(server.EnterpriseWorkflowEngine):
+        """Holds each progression after it has read the task until both have, forcing the race"""
+        def __init__(self, database):
+            super().__init__(database)
+            self.readers = 0
+            self.both_read = asyncio.Event()
+
+        async def get_workflow(self, workflow_id):
+            self.readers += 1
+            if self.readers == 2:
+                self.both_read.set()
+            await self.both_read.wait()
+            return await super().get_workflow(workflow_id)
+
+    async def body(db):
+        workflow = await create_approval_workflow(db)
+        task = await create_started_task(db, server.EnterpriseWorkflowEngine(db), workflow)
+        engine = LockstepEngine(db)
+
+        results = await asyncio.gather(
+            engine.progress_workflow(task.id, USER_ID, comment="a"),
+            engine.progress_workflow(task.id, USER_ID, comment="b"),
+            return_exceptions=True
+        )
+
+        conflicts = [r for r in results if isinstance(r, HTTPException)]
+        assert len(conflicts) == 1
+        assert conflicts[0].status_code == 409
+
+        stored = await db.tasks.find_one({"id": task.id}, {"_id": 0})
+        assert stored["workflow_state"]["current_step"] == "review"
+        assert [s["step_id"] for s in stored["workflow_state"]["completed_steps"]] == ["start"]
+        assert len(stored["workflow_state"]["pending_approvals"]) == 1
+
+    run_with_db(body)